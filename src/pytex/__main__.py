@@ -37,18 +37,55 @@ If you ever meet Stefan Schinkel, please invite him to two beers!
 
 # imports
 # -----------------------------------------------------------------------------
+from __future__ import annotations
+
+import fnmatch
+import functools
+import importlib.util
+import locale
 import os
 import re
 import shutil
+import stat
 import sys
 
 from pathlib import Path
 
 from . import argparser
-from . import bib
 from . import conf
-from . import index
-from . import process
+
+
+# -----------------------------------------------------------------------------
+# _lazy_import
+#
+# Return the module with the given name, which is effectively loaded only when
+# any of its attributes is accessed for the first time. This is used for the
+# modules which are not needed to parse the command line or to clear the
+# ancilliary files, so that the startup is not delayed
+# -----------------------------------------------------------------------------
+def _lazy_import(name: str):
+    """Return the module with the given name, which is effectively loaded only
+       when any of its attributes is accessed for the first time. This is used
+       for the modules which are not needed to parse the command line or to
+       clear the ancilliary files, so that the startup is not delayed
+
+    """
+
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+bib = _lazy_import(f"{__package__}.bib")
+index = _lazy_import(f"{__package__}.index")
+process = _lazy_import(f"{__package__}.process")
 
 
 # constants
@@ -70,9 +107,10 @@ RE_ANCILLIARY_IGNORE = re.compile(r'^(\s*|\s*#.*)$')
 INFO_PDF_FILE_GENERATED = " {} generated"
 INFO_REMOVING_FILE = " Removing file {} ..."
 INFO_REMOVING_DIRECTORY = " Removing directory {} ..."
+INFO_UP_TO_DATE = " {} is up-to-date"
 
 # Warning messages
-WARNING_MAX_NB_CYCLES = " The maximum number of cycles, {}, has been reached and the processor still recommends re-running the files"
+WARNING_MAX_NB_CYCLES = " The maximum number of cycles, {}, has been reached and the processor still recommends re-running the files (see --max-cycles)"
 WARNING_NB_WARNINGS = " Number of warnings: {}"
 
 # Warning messages
@@ -82,6 +120,43 @@ ERROR_NO_PDF_FILE_GENERATED = " No pdf output has been generated"
 # functions
 # -----------------------------------------------------------------------------
 
+# -----------------------------------------------------------------------------
+# get_ancilliary_patterns
+#
+# The description of the ancilliary files is given in the configuration file,
+# which in turn, is taken from the typical .gitignore used in LaTeX projects.
+# All entries might be either files or directories. Ignoring both blank lines
+# and comments, return a list with a regexp for every pattern, along with
+# whether it can produce an arbitrary number of matches (unless it is applied to
+# files with any name) and whether it matches only directories (i.e., it ends
+# with a slash)
+#
+# The list is computed only once, the first time it is requested, so that it
+# does not delay the startup when no file has to be removed
+# -----------------------------------------------------------------------------
+@functools.cache
+def get_ancilliary_patterns() -> list[tuple[re.Pattern, bool, bool]]:
+    """The description of the ancilliary files is given in the configuration
+       file, which in turn, is taken from the typical .gitignore used in LaTeX
+       projects. All entries might be either files or directories. Ignoring
+       both blank lines and comments, return a list with a regexp for every
+       pattern, along with whether it can produce an arbitrary number of
+       matches (unless it is applied to files with any name) and whether it
+       matches only directories (i.e., it ends with a slash)
+
+       The list is computed only once, the first time it is requested, so that
+       it does not delay the startup when no file has to be removed
+
+    """
+
+    flags = re.IGNORECASE if os.name == "nt" else 0
+    return [(re.compile(fnmatch.translate(ipattern.rstrip('/')), flags),
+             RE_GLOB_MATCHES.search(ipattern) is not None and ipattern not in conf.ANCILLIARY_ANY_NAME,
+             ipattern.endswith('/'))
+            for ipattern in conf.ANCILLIARY_EXT.splitlines()
+            if not RE_ANCILLIARY_IGNORE.match(ipattern)]
+
+
 # -----------------------------------------------------------------------------
 # guess_filename
 #
@@ -93,7 +168,7 @@ ERROR_NO_PDF_FILE_GENERATED = " No pdf output has been generated"
 #
 # If none of these rules work then None is returned
 # -----------------------------------------------------------------------------
-def guess_filename(basename: str) -> Path | None:
+def guess_filename(basename: Path) -> Path | None:
     """guess the main LaTeX file to process. The rules are simple:
 
          1. The extension .tex is tried first (even if the user did not provide
@@ -106,39 +181,45 @@ def guess_filename(basename: str) -> Path | None:
 
     """
 
-    # is it a .tex file?
-    base = Path(basename)
-    texfile = base.with_suffix(".tex")
-    if texfile.exists() and os.access(texfile, os.R_OK):
-        return texfile
-
-    # is it a .latex file?
-    latexfile = base.with_suffix(".latex")
-    if latexfile.exists() and os.access(latexfile, os.R_OK):
-        return latexfile
+    # try first a .tex file and then a .latex file. Each candidate is opened
+    # for reading, which tells at once whether it exists and is readable, and
+    # it is accepted if it is a regular file. It is opened in non-blocking mode
+    # so that named pipes can not block the call
+    flags = os.O_RDONLY | getattr(os, "O_NONBLOCK", 0) | getattr(os, "O_CLOEXEC", 0)
+    for suffix in (".tex", ".latex"):
+        candidate = basename.with_suffix(suffix)
+        try:
+            fd = os.open(candidate, flags)
+        except OSError:
+            continue
+        try:
+            if stat.S_ISREG(os.fstat(fd).st_mode):
+                return candidate
+        finally:
+            os.close(fd)
 
     return None
 
 # -----------------------------------------------------------------------------
 # run_latex
 #
-# run the LaTeX processor
+# run the LaTeX processor, in draft mode if draft is True
 # -----------------------------------------------------------------------------
-def run_latex(processor: process.Processor, quiet: bool):
-    """run the LaTeX processor
+def run_latex(processor: process.Processor, quiet: bool, draft: bool = False):
+    """run the LaTeX processor, in draft mode if draft is True
 
     """
 
     # process the LaTeX file
-    processor.run()
+    processor.run(draft)
 
     if len(processor.get_errors()) > 0:
         sys.exit(1)
 
     # in case that any warning was generated, show the number in spite of
     # the value of quiet
-    if processor.get_nbwarnings() > 0:
-        print(WARNING_NB_WARNINGS.format(processor.get_nbwarnings()))
+    if (nbwarnings := processor.get_nbwarnings()) > 0:
+        print(WARNING_NB_WARNINGS.format(nbwarnings))
 
     # and leave a blank line
     if not quiet:
@@ -165,9 +246,8 @@ def run_bib(tool: bib.Bibtool) -> bool:
     # check first whether it is necessary to process the files
     if tool.get_rerun():
 
-        # get all bibunits that have to be processed
-        for bibunit in tool.get_bibfiles():
-            bib_exec = bib_exec or tool.run(bibunit)
+        # process all bibunits at once, so that they are run concurrently
+        bib_exec = tool.run_all(tool.get_bibfiles())
 
     return bib_exec
 
@@ -193,34 +273,80 @@ def run_index(tool: index.Idxtool) -> bool:
 
         # get all index files that have to be processed
         for idxunit in tool.get_idx_files():
-            index_exec = index_exec or tool.run(idxunit)
+            index_exec = tool.run(idxunit) or index_exec
 
     return index_exec
 
+# -----------------------------------------------------------------------------
+# hash_build
+#
+# Return a fingerprint of all the inputs of the last build of the given texfile
+# with the given processor, including the bib databases and the local bib and
+# index styles, or the empty string if it can not be computed
+# -----------------------------------------------------------------------------
+def hash_build(texfile: Path, processor: str, bib_hint: str, index_hint: str, encoding: str) -> str:
+    """Return a fingerprint of all the inputs of the last build of the given
+       texfile with the given processor, including the bib databases and the
+       local bib and index styles, or the empty string if it can not be
+       computed
+
+    """
+
+    # the bib databases and styles are not read by the processor, and thus they
+    # are not recorded in the .fls file
+    extra = []
+    if (tool := bib_hint or bib.guess_bibtool(texfile, encoding)):
+        for ibibfile in bib.guess_bibfiles(texfile, tool, encoding):
+            if (idatabases := bib.get_bib_databases(ibibfile, tool, encoding)) is None:
+                return ""
+            extra += idatabases + bib.get_bib_styles(ibibfile, tool, encoding)
+
+    # and neither are the index styles
+    if index_hint or index.guess_index_tool(texfile, encoding):
+        extra += index.get_index_styles()
+
+    return process.hash_inputs(texfile, processor, extra)
+
 # -----------------------------------------------------------------------------
 # Automates processing a specific .tex file (named after texfile), which is
 # guaranteed to exist and to be readable
 #
 # It also guesses whether to process the bib references and/or the index tables
 #
+# In case none of the inputs changed since the last successful build, the
+# texfile is not processed again unless force is True
+#
+# If draft is True, all passes but the last one are run in draft mode
+#
+# The processor is run at most max_nb_cycles times, even if it still
+# recommends re-running the files. In draft mode, this includes the last pass,
+# which is the only one run in full in case the limit is reached
+#
 # In case an output is given, the resulting pdf file is renamed acordingly
 # -----------------------------------------------------------------------------
 def run_pipeline(texfile: Path,
                  processor: str, bib_hint: str, index_hint: str, encoding: str,
-                 output: str, quiet: bool):
+                 output: str, quiet: bool, force: bool = False, draft: bool = False,
+                 max_nb_cycles: int = conf.DEFAULT_MAX_NB_CYCLES):
     """Automates processing a specific .tex file (named after texfile), which is
        guaranteed to exist and to be readable
 
        It also guesses whether to process the bib references and/or the index
        tables and what tools to do so
 
+       In case none of the inputs changed since the last successful build, the
+       texfile is not processed again unless force is True
+
+       If draft is True, all passes but the last one are run in draft mode
+
+       The processor is run at most max_nb_cycles times, even if it still
+       recommends re-running the files. In draft mode, this includes the last
+       pass, which is the only one run in full in case the limit is reached
+
        In case an output is given, the resulting pdf file is renamed acordingly
 
     """
 
-    # set the maximum number of cycles
-    max_nb_cycles = 5
-
     # create a LaTeX processor
     compiler = process.Processor(texfile, processor, encoding, quiet)
 
@@ -230,32 +356,76 @@ def run_pipeline(texfile: Path,
     # and also initialize the executions of the bib/index tools
     bib_exec, index_exec = False, False
 
+    # in case none of the inputs changed since the last successful build, then
+    # skip processing the texfile, but show the warnings of the last build
+    up_to_date = not force and process.is_up_to_date(texfile, hash_build(texfile, processor, bib_hint, index_hint, encoding))
+    if up_to_date:
+        print(INFO_UP_TO_DATE.format(texfile))
+        compiler.process_warnings()
+        if (nbwarnings := compiler.get_nbwarnings()) > 0:
+            print(WARNING_NB_WARNINGS.format(nbwarnings))
+
+    # the files written by the processor which are read back in the next pass
+    # are fingerprinted after every pass. In case they did not change and no
+    # bib/index tool was used, then another pass would produce the very same
+    # results, even if the processor recommends re-running the files
+    (outputs, stable) = ("", False)
+
+    # in draft mode, tells whether the last pass was run in draft mode
+    drafted = False
+
     # until the processor is happy or five full cycles have been consumed. This
     # might happen with some "pathological" docs. Also, if a bib/index tool was
     # used in the last iteration, then force a new processing stage
-    while (compiler.get_rerun() or bib_exec or index_exec) and \
+    while not up_to_date and (compiler.get_rerun() or bib_exec or index_exec) and \
           compiler.get_nbcycles() < max_nb_cycles:
 
         # first things first, the unavoidable step is to process the texfile and, if
-        # any errors happened, then abort execution
-        run_latex(compiler, quiet)
+        # any errors happened, then abort execution. In draft mode, the last
+        # pass allowed generates the output
+        drafted = draft and compiler.get_nbcycles() < max_nb_cycles - 1
+        run_latex(compiler, quiet, drafted)
 
         # In case the bibtool does not exist yet, create it, and then reuse it
-        # in the following cycles.
-        if not bibtool:
+        # in the following cycles. It is created only if a tool was given or
+        # there is any evidence of bib references
+        if not bibtool and (bib_hint or bib.guess_bibtool(texfile, encoding)):
             bibtool = bib.Bibtool(texfile, encoding, bib_hint, quiet)
-        bib_exec = run_bib(bibtool)
+        bib_exec = run_bib(bibtool) if bibtool else False
 
         # In case the index tool does not exist yet, create it, and then reuse
-        # it in the following cycles
-        if not idxtool:
+        # it in the following cycles. Likewise, it is created only if a tool
+        # was given or there is any evidence of indices
+        if not idxtool and (index_hint or index.guess_index_tool(texfile, encoding)):
             idxtool = index.Idxtool(texfile, encoding, index_hint, quiet)
-        index_exec = run_index(idxtool)
+        index_exec = run_index(idxtool) if idxtool else False
+
+        # stop in case another pass would produce the same results
+        last_outputs, outputs = outputs, process.hash_outputs(texfile)
+        if compiler.get_rerun() and not (bib_exec or index_exec) and \
+           outputs != "" and outputs == last_outputs:
+            stable = True
+            break
+
+    # in case the last pass was run in draft mode, no output has been generated
+    # yet, so that one last pass is required. Note that at most max_nb_cycles-1
+    # passes are run in draft mode, so that the limit is never exceeded
+    if drafted:
+        run_latex(compiler, quiet)
 
-    # show a warning in case the processor insists in re-running even if the
-    # maximum number of cycles was reached
-    if compiler.get_rerun() and compiler.get_nbcycles() >= max_nb_cycles:
-        print(WARNING_MAX_NB_CYCLES.format(max_nb_cycles))
+    # the processor might still recommend re-running the files, either because
+    # another pass would produce the same results or because the maximum number
+    # of cycles was reached. Only in the latter case a warning is shown
+    converged = True
+    if not up_to_date and compiler.get_rerun():
+        converged = stable
+        if not stable:
+            print(WARNING_MAX_NB_CYCLES.format(max_nb_cycles))
+
+        # in either case, the warnings of the last run were not parsed yet
+        compiler.process_warnings()
+        if (nbwarnings := compiler.get_nbwarnings()) > 0:
+            print(WARNING_NB_WARNINGS.format(nbwarnings))
 
     # in case an output filename was given, rename the output pdf file to the
     # name given
@@ -266,6 +436,12 @@ def run_pipeline(texfile: Path,
         print(ERROR_NO_PDF_FILE_GENERATED)
         sys.exit(1)
 
+    # store the fingerprint of the inputs of this build, unless it was skipped
+    # or the processor still recommends re-running the files
+    if not up_to_date and converged and \
+       (fingerprint := hash_build(texfile, processor, bib_hint, index_hint, encoding)) != "":
+        texfile.with_suffix(process.BUILDHASH_SUFFIX).write_text(fingerprint)
+
     if output != "":
 
         # get a path to the output file and rename the pdf file generated
@@ -291,36 +467,32 @@ def run_clear(texfile: Path, delete: bool):
 
     """
 
-    # The description of the ancilliary files is given in the configuration
-    # file, which in turn, is taken from the typical .gitignore used in LaTeX
-    # projects. All entries might be either files or directories
-    for ipattern in conf.ANCILLIARY_EXT.splitlines():
-
-        # ignore both blank lines and comments
-        if not RE_ANCILLIARY_IGNORE.match(ipattern):
-
-            # look in the current working directory for all occurrences of this
-            # pattern
-            base = Path('.')
-            for imatch in base.glob(ipattern):
+    # look in the current working directory, only once, for all entries
+    # matching any pattern
+    stem = texfile.with_suffix('').name
+    with os.scandir('.') as it:
+        for ientry in it:
+            is_dir = ientry.is_dir(follow_symlinks=False)
+            for (regexp, multiple, dirs_only) in get_ancilliary_patterns():
 
                 # in case this pattern was expected to produce an arbitrary
-                # number of matches, then check the match contains the name of
+                # number of matches, then check the entry contains the name of
                 # the texfile without suffix; otherwise, accept it and proceed
                 # to its removal
-                multiple = re.search(RE_GLOB_MATCHES, ipattern)
-                if not multiple or \
-                   (multiple and texfile.with_suffix('').name in imatch.name):
-
-                    # Next verify, whether this is a file or a directory and in
-                    # either case enforce removing the corresponding match
-                    # accordingly
-                    if imatch.is_file():
-                        print(INFO_REMOVING_FILE.format(imatch))
-                        imatch.unlink(missing_ok=True)
-                    elif imatch.is_dir():
-                        print(INFO_REMOVING_DIRECTORY.format(imatch))
-                        shutil.rmtree(imatch, ignore_errors=True)
+                if (is_dir or not dirs_only) and regexp.match(ientry.name) and \
+                   (not multiple or stem in ientry.name):
+
+                    # Next verify, whether this is a directory or not and in
+                    # either case enforce removing the corresponding entry
+                    # accordingly. Symbolic links are removed, but never
+                    # followed
+                    if is_dir:
+                        print(INFO_REMOVING_DIRECTORY.format(ientry.name))
+                        shutil.rmtree(ientry.path, ignore_errors=True)
+                    else:
+                        print(INFO_REMOVING_FILE.format(ientry.name))
+                        Path(ientry.path).unlink(missing_ok=True)
+                    break
 
     # in case it is also requested to remove the .pdf file, ...
     if delete:
@@ -353,23 +525,16 @@ def main():
 
         # Otherwise, proceed to process the given latex file. First determine
         # the encoding. The user settings are used first; if none is given the
-        # env vars are checked and if this did not help either then the default
-        # value is ued
-        encoding = cli.encoding
-        if encoding is None:
-
-            # get the environment variable for LC_ALL
-            encoding = os.environ.get("LC_ALL")
-            if encoding is None:
-
-                # then resort to UTF-8
-                encoding = "UTF-8"
+        # encoding of the current locale (as given by LC_ALL, LC_CTYPE or LANG)
+        # is used and if this did not help either then the default value is
+        # used. It is computed only once and then passed along to all tools
+        encoding = cli.encoding or locale.getpreferredencoding(False) or "UTF-8"
 
         # show the encoding
         print(f" Using encoding {encoding}")
 
         # invoke the main service of this #!/usr/bin/env python
-        run_pipeline(filename, cli.processor, cli.bib, cli.index, encoding, cli.output, cli.quiet)
+        run_pipeline(filename, cli.processor, cli.bib, cli.index, encoding, cli.output, cli.quiet, cli.force, cli.draft, cli.max_cycles)
 
 
 # main
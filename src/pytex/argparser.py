@@ -16,6 +16,28 @@ Command-line interface parser
 # imports
 # -----------------------------------------------------------------------------
 import argparse
+import pathlib
+
+from . import conf
+
+# -----------------------------------------------------------------------------
+# positive_int
+#
+# Return the integer given in the specified string, which must be positive
+# -----------------------------------------------------------------------------
+def positive_int(value: str) -> int:
+    """Return the integer given in the specified string, which must be
+       positive
+
+    """
+
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"a positive number is expected, but {value} was given")
+    return number
 
 # -----------------------------------------------------------------------------
 # create a command parser to parse all params passed to the script program
@@ -29,23 +51,26 @@ def create_arg_parser():
     # Group of mandatory arguments
     mandatory = parser.add_argument_group("Mandatory arguments", "The following arguments are mandatory and they must be provided:")
     mandatory.add_argument("texfile",
+                           type=pathlib.Path,
                            help="Main LaTeX file to process. Only files with suffix '.tex' and '.latex' are accepted.")
 
     # Group of optional arguments
     optional = parser.add_argument_group("Optional arguments", "The following arguments are optional and can be used to override variables automatically set by this script:")
     optional.add_argument('-p', '--processor',
                           type=str,
+                          choices=["latex", "pdflatex", "xelatex", "lualatex"],
                           default="pdflatex",
-                          help="What LaTeX processor must be used to compile the main .tex file, e.g., 'latex', 'pdflatex', 'xelatex', etc. By default 'pdflatex'")
+                          help="What LaTeX processor must be used to compile the main .tex file, either 'latex', 'pdflatex', 'xelatex' or 'lualatex'. By default 'pdflatex'")
     optional.add_argument('-b', '--bib',
                           type=str,
+                          choices=["bibtex", "biber"],
                           help="Tool used to process the bib entries, if any is found. Only 'bibtex' and 'biber' are automatically supported. If none is provided, pytex will guess the right tool to use")
     optional.add_argument('-i', '--index',
                           type=str,
                           help="Tool used to process the indices, if any is found. Only 'makeidx' and 'splitindex' are supported. If none is provided, pytex will guess the right tool to use")
     optional.add_argument('-e', '--encoding',
                           type=str,
-                          help="Encoding used to capture the output produced by the different tools. If none is given, the contents of the env variable 'LC_ALL' are used")
+                          help="Encoding used to capture the output produced by the different tools. If none is given, the encoding of the current locale (as set with the env variables 'LC_ALL', 'LC_CTYPE' or 'LANG') is used")
     optional.add_argument('-x', '--clear',
                           action="store_true",
                           help="If given, no processing takes place and all ancilliary files generated for the given texfile are automatically removed. No confirmation is requested")
@@ -56,6 +81,16 @@ def create_arg_parser():
                           default="",
                           type=str,
                           help="Name of the pdf generated file. If none is given, it will be named after the input filename")
+    optional.add_argument('-d', '--draft',
+                          action="store_true",
+                          help="If given, all passes but the last one are run in draft mode, i.e., without generating the pdf file. Every pass is faster, but one additional pass is always run at the end. This pass is counted within the maximum number of cycles given with --max-cycles")
+    optional.add_argument('-f', '--force',
+                          action="store_true",
+                          help="If given, the tex file is processed even if none of its inputs changed since the last successful build")
+    optional.add_argument('-m', '--max-cycles',
+                          type=positive_int,
+                          default=conf.DEFAULT_MAX_NB_CYCLES,
+                          help=f"Maximum number of times the LaTeX processor is run, even if it still recommends re-running the files. By default, {conf.DEFAULT_MAX_NB_CYCLES}")
     optional.add_argument('-q', '--quiet',
                           action="store_true",
                           help="If given, only the warnings generated by the bib/index tools are shown. Still, pytex will be showing how many warnings are generated as a result of processing the .tex files")
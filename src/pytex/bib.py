@@ -16,17 +16,28 @@ the standard output and the standard error
 
 # imports
 # -----------------------------------------------------------------------------
-import hashlib
+import os
 import re
-import shlex
-import subprocess
+import sys
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# google-re2 provides a regular expression engine which runs in linear time. It
+# is used, if available, to scan .aux files. Otherwise, the standard re module
+# is used instead
+try:
+    import re2 as re_aux
+except ImportError:
+    re_aux = re
+
 
 # constants
 # -----------------------------------------------------------------------------
 
+# info messages
+INFO_UP_TO_DATE = " {} {} is up-to-date"
+
 # warning messages
 WARNING_DIFFERENT_TOOL = " {} was given to process the bibliography and it will be used, but it is recommended to use {} instead"
 WARNING_NO_BIB_FILES = " No bib files found with tool {}"
@@ -34,13 +45,167 @@ WARNING_NO_BIB_FILES = " No bib files found with tool {}"
 # regular expressions
 
 # regular expression used to look for bib directives in .aux files and also to
-# generate the fingerprint of bib files
-RE_BIB = re.compile(r'\\bibdata\{.*?\}|\\citation\{.*?\}')
+# generate the fingerprint of bib files. Because all directives are pure ASCII,
+# it is applied directly over the raw contents of .aux files, so that they do
+# not have to be decoded. Note that the arguments of the directives never
+# contain a closing brace, and thus a negated character class is used to avoid
+# backtracking. It is also compatible with google-re2
+RE_BIB_B = re_aux.compile(rb'\\bibdata\{[^}]*\}|\\bibstyle\{[^}]*\}|\\citation\{[^}]*\}')
+
+# literal prefixes of all bib directives matched by RE_BIB_B. They are used to
+# discard .aux files without bib directives before running the regex
+BIB_DIRECTIVE_PREFIXES = (b'\\bibdata{', b'\\bibstyle{', b'\\citation{')
+
+# regular expression used to extract the bib databases given in \bibdata
+# directives
+RE_BIBDATA_B = re.compile(rb'\\bibdata\{(?P<databases>[^}]*)\}')
+
+# regular expression used to extract the bib style given in \bibstyle directives
+RE_BIBSTYLE_B = re.compile(rb'\\bibstyle\{(?P<style>[^}]*)\}')
+
+# regular expression used to extract the bib databases given in .bcf files
+RE_BCF_DATASOURCE = re.compile(r'<bcf:datasource[^>]*>(?P<database>[^<]+)</bcf:datasource>')
+
+# size of the blocks used to read files when computing their fingerprint
+HASH_BLOCK_SIZE = 64 * 1024
+
+# maximum number of executions of the bib tool run concurrently
+MAX_RUN_WORKERS = os.cpu_count() or 1
+
+# suffix of the files used to store the fingerprint of the bib directives of
+# every bibunit after being successfully processed
+BIBHASH_SUFFIX = ".pytex-bibhash"
+
+
+# globals
+# -----------------------------------------------------------------------------
+
+# classes
+# -----------------------------------------------------------------------------
+
+# -----------------------------------------------------------------------------
+# AuxBatch
+#
+# Definition of a batch of .aux files. It stores, in parallel lists, the path to
+# every file and the bib directives found in it
+# -----------------------------------------------------------------------------
+class AuxBatch:
+    """Definition of a batch of .aux files. It stores, in parallel lists, the
+       path to every file and the bib directives found in it
+
+    """
+
+    def __init__(self):
+        """A batch of .aux files is initialized empty"""
+
+        (self._paths, self._matches) = ([], [])
+
+    def add(self, path: Path, matches: list[bytes]):
+        """Add the given .aux file to this batch with the bib directives found
+        in it"""
+
+        self._paths.append(path)
+        self._matches.append(matches)
+
+    def get_bibfiles(self) -> list[Path]:
+        """Return the paths to all .aux files in this batch with bib directives"""
+
+        return [ipath for ipath, imatches in zip(self._paths, self._matches) if len(imatches) > 0]
+
+    def get_matches(self) -> list[list[bytes]]:
+        """Return the bib directives found in every .aux file of this batch"""
+
+        return self._matches
 
 
 # functions
 # -----------------------------------------------------------------------------
 
+# -----------------------------------------------------------------------------
+# _list_aux
+#
+# Return all .aux files found in the given directory sorted by name
+# -----------------------------------------------------------------------------
+def _list_aux(cwd: Path) -> list[Path]:
+    """Return all .aux files found in the given directory sorted by name"""
+
+    # the entries returned by scandir are used directly to avoid stat'ing every
+    # file
+    with os.scandir(cwd) as it:
+        return sorted(Path(entry.path) for entry in it
+                      if entry.is_file(follow_symlinks=False) and entry.name.endswith('.aux'))
+
+
+# -----------------------------------------------------------------------------
+# _aux_mtime
+#
+# Return the time of the last modification (in nanoseconds) of the given .aux
+# file, or zero if it can not be stat'ed
+# -----------------------------------------------------------------------------
+def _aux_mtime(path: Path) -> int:
+    """Return the time of the last modification (in nanoseconds) of the given
+       .aux file, or zero if it can not be stat'ed
+
+    """
+
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+# -----------------------------------------------------------------------------
+# _may_have_bib
+#
+# Return whether the given contents contain the prefix of any bib directive.
+# If not, they contain no bib directive at all
+# -----------------------------------------------------------------------------
+def _may_have_bib(buf: bytes) -> bool:
+    """Return whether the given contents contain the prefix of any bib
+       directive. If not, they contain no bib directive at all
+
+    """
+
+    return any(buf.find(iprefix) != -1 for iprefix in BIB_DIRECTIVE_PREFIXES)
+
+
+# -----------------------------------------------------------------------------
+# _scan_aux
+#
+# Return all bib directives found in the given .aux file
+# -----------------------------------------------------------------------------
+def _scan_aux(path: Path) -> list[bytes]:
+    """Return all bib directives found in the given .aux file"""
+
+    buf = path.read_bytes()
+    return RE_BIB_B.findall(buf) if _may_have_bib(buf) else []
+
+
+# -----------------------------------------------------------------------------
+# _aux_batch
+#
+# Return the paths to all .aux files found in the given directory, along with
+# the bib directives found in each one. Files which can not be read are ignored
+# -----------------------------------------------------------------------------
+def _aux_batch(cwd: Path) -> AuxBatch:
+    """Return the paths to all .aux files found in the given directory, along
+       with the bib directives found in each one. Files which can not be read
+       are ignored
+
+    """
+
+    # store the path to every file along with its bib directives in parallel
+    # lists
+    batch = AuxBatch()
+    for ipath in _list_aux(cwd):
+        try:
+            batch.add(ipath, _scan_aux(ipath))
+        except OSError:
+            continue
+
+    return batch
+
+
 # -----------------------------------------------------------------------------
 # guess_bibtool
 #
@@ -75,15 +240,26 @@ def guess_bibtool(filename: Path, encoding: str) -> str | None:
         return "biber"
 
     # Otherwise, check whether there are files with extension .aux that contain
-    # bib directives
-    for aux_path in list(Path.cwd().glob("*.aux")):
-
+    # bib directives. The main .aux file is the most likely one to contain
+    # them, so that it is examined first
+    main_aux = Path.cwd() / filename.with_suffix(".aux")
+    try:
+        if len(_scan_aux(main_aux)) > 0:
+            return "bibtex"
+    except OSError:
+        pass
+
+    # All the others are examined next, the most recently modified first, and
+    # the search stops as soon as one is found. Files that can not be read are
+    # ignored
+    aux_paths = sorted((ipath for ipath in _list_aux(Path.cwd()) if ipath != main_aux),
+                       key=_aux_mtime, reverse=True)
+    for aux_path in aux_paths:
         try:
-            txt = aux_path.read_text(encoding=encoding, errors="ignore")
-        except Exception:
+            if len(_scan_aux(aux_path)) > 0:
+                return "bibtex"
+        except OSError:
             continue
-        if RE_BIB.search(txt):
-            return "bibtex"
 
     # otherwise, make no recommendation
     return None
@@ -119,17 +295,7 @@ def guess_bibfiles(filename: Path, tool: str, encoding: str) -> list[Path]:
         return aux_files
 
     # Otherwise, return only the .aux files that contain bib directives
-    for aux_path in list(Path.cwd().glob("*.aux")):
-
-        try:
-            txt = aux_path.read_text(encoding=encoding, errors="ignore")
-        except Exception:
-            continue
-        if RE_BIB.search(txt):
-            aux_files.append(aux_path)
-
-    # and return all files
-    return aux_files
+    return _aux_batch(Path.cwd()).get_bibfiles()
 
 
 # -----------------------------------------------------------------------------
@@ -153,34 +319,168 @@ def hash_bibfiles(filename: Path, tool: str, encoding: str) -> str:
     if len(bibfiles) == 0:
         return ""
 
+    # hashlib is imported only when a fingerprint has to be computed
+    import hashlib
+
     # in case biber is used, just return the md5 hash code of the bcf file
     if tool == "biber":
-        txt = bibfiles[0].read_text(encoding=encoding, errors="ignore")
-        return hashlib.md5(txt.encode(encoding)).hexdigest()
+        return hash_bibunit(bibfiles[0], tool)
 
-    # if bibtex is used, then process all files and build a string which
-    # contains only lines with \bibdata/\bibstyle/\citation
+    # if bibtex is used, then process all files and feed the md5 hash code
+    # incrementally only with lines with \bibdata/\bibstyle/\citation
     if tool == "bibtex":
 
-        contents = ""
-        for aux_path in bibfiles:
-            txt = aux_path.read_text(encoding=encoding, errors="ignore")
+        md5 = hashlib.md5()
+        for matches in _aux_batch(Path.cwd()).get_matches():
 
-            # and now get all the bib directives in this file
-            bib_contents = ""
-            for m in RE_BIB.finditer(txt):
-                bib_contents += m.group(0) + '\n'
-
-            # and add it to the overall contents
-            contents += bib_contents
+            # get all the bib directives in every file, which have been already
+            # scanned before, and update the hash code with them, one per line
+            if len(matches) > 0:
+                md5.update(b'\n'.join(matches) + b'\n')
 
         # and return the md5 hash code
-        return hashlib.md5(contents.encode(encoding)).hexdigest()
+        return md5.hexdigest()
 
     # This should never happen but ...
     return ""
 
 
+# -----------------------------------------------------------------------------
+# hash_bibunit
+#
+# Return a md5 hash code that provides a blueprint of the given bibunit. It is
+# stored after every successful processing of the bibunit to determine whether
+# the bib tool has to be run again over it, or not
+# -----------------------------------------------------------------------------
+def hash_bibunit(bibfile: Path, tool: str) -> str:
+    """Return a md5 hash code that provides a blueprint of the given bibunit.
+       It is stored after every successful processing of the bibunit to
+       determine whether the bib tool has to be run again over it, or not
+
+    """
+
+    # hashlib is imported only when a fingerprint has to be computed
+    import hashlib
+
+    md5 = hashlib.md5()
+
+    # in case biber is used, the raw contents of the bcf file are read in blocks
+    # of a fixed size
+    if tool == "biber":
+        with bibfile.open('rb') as stream:
+            while block := stream.read(HASH_BLOCK_SIZE):
+                md5.update(block)
+
+    # if bibtex is used, only the bib directives of the bibunit are used, one
+    # per line
+    elif tool == "bibtex":
+        if (matches := _scan_aux(bibfile)):
+            md5.update(b'\n'.join(matches) + b'\n')
+
+    return md5.hexdigest()
+
+
+# -----------------------------------------------------------------------------
+# get_bib_databases
+#
+# Return the paths to all bib databases used in the given bibunit, or None if
+# any of them can not be found in the current working directory
+# -----------------------------------------------------------------------------
+def get_bib_databases(bibfile: Path, tool: str, encoding: str) -> list[Path] | None:
+    """Return the paths to all bib databases used in the given bibunit, or None
+       if any of them can not be found in the current working directory
+
+    """
+
+    names = []
+
+    # biber stores the bib databases as datasources of the .bcf file
+    if tool == "biber":
+        txt = bibfile.read_text(encoding=encoding, errors="ignore")
+        names = [m.group("database").strip() for m in RE_BCF_DATASOURCE.finditer(txt)]
+
+    # bibtex, instead, takes them from the \bibdata directives, where the suffix
+    # .bib is omitted
+    elif tool == "bibtex":
+        matches = _scan_aux(bibfile)
+        for imatch in matches:
+            if (m := RE_BIBDATA_B.match(imatch)):
+                for iname in m.group("databases").decode(encoding, errors="replace").split(','):
+                    if (iname := iname.strip()) != "":
+                        names.append(iname if iname.endswith('.bib') else iname + '.bib')
+
+    # verify all databases exist
+    databases = [Path(iname) for iname in names]
+    if any(not idatabase.exists() for idatabase in databases):
+        return None
+    return databases
+
+
+# -----------------------------------------------------------------------------
+# get_bib_styles
+#
+# Return the paths to the bib styles used in the given bibunit which are found
+# in the current working directory. Styles installed elsewhere are not returned,
+# as they are not expected to change between builds
+# -----------------------------------------------------------------------------
+def get_bib_styles(bibfile: Path, tool: str, encoding: str) -> list[Path]:
+    """Return the paths to the bib styles used in the given bibunit which are
+       found in the current working directory. Styles installed elsewhere are
+       not returned, as they are not expected to change between builds
+
+    """
+
+    # only bibtex uses styles, which are given in the \bibstyle directives
+    # without the suffix .bst
+    if tool != "bibtex":
+        return []
+
+    styles = []
+    matches = _scan_aux(bibfile)
+    for imatch in matches:
+        if (m := RE_BIBSTYLE_B.match(imatch)):
+            if (iname := m.group("style").decode(encoding, errors="replace").strip()) != "":
+                styles.append(Path(iname if iname.endswith('.bst') else iname + '.bst'))
+    return [istyle for istyle in styles if istyle.exists()]
+
+
+# -----------------------------------------------------------------------------
+# is_up_to_date
+#
+# Return whether the given bibunit does not need to be processed again. This
+# happens only in case the fingerprint stored after its last successful
+# processing is the same than the given one, and its .bbl file exists and is
+# newer than all the bib databases and local bib styles it uses
+# -----------------------------------------------------------------------------
+def is_up_to_date(bibfile: Path, tool: str, fingerprint: str, encoding: str) -> bool:
+    """Return whether the given bibunit does not need to be processed again.
+       This happens only in case the fingerprint stored after its last
+       successful processing is the same than the given one, and its .bbl file
+       exists and is newer than all the bib databases and local bib styles it
+       uses
+
+    """
+
+    # check the fingerprint stored after the last processing
+    sidecar = bibfile.with_suffix(BIBHASH_SUFFIX)
+    if not sidecar.exists() or \
+       sidecar.read_text(encoding=encoding, errors="ignore").strip() != fingerprint:
+        return False
+
+    # verify the output exists
+    bbl = bibfile.with_suffix(".bbl")
+    if not bbl.exists():
+        return False
+
+    # and that it is newer than all bib databases and local bib styles
+    databases = get_bib_databases(bibfile, tool, encoding)
+    if databases is None:
+        return False
+    bbl_mtime = bbl.stat().st_mtime_ns
+    return all(ifile.stat().st_mtime_ns <= bbl_mtime
+               for ifile in databases + get_bib_styles(bibfile, tool, encoding))
+
+
 # -----------------------------------------------------------------------------
 # Bibtool
 #
@@ -224,6 +524,9 @@ class Bibtool:
         if not tool or tool == "":
             self._tool = recommended
 
+        # the command line used to invoke the bib tool is computed only once
+        self._argv_prefix = [self._tool] if self._tool else []
+
         # and now get all bibunits to process
         self._bib_files = guess_bibfiles(texfile, self._tool, encoding)
         if self._tool is not None and self._tool != "" and len(self._bib_files) == 0:
@@ -265,43 +568,100 @@ class Bibtool:
 
         """
 
+        return self.run_all([bibfile])
+
+    def run_all(self, bibfiles: list[Path]) -> bool:
+        """Process all the specified bib files. The bib tool is executed
+           concurrently over all those which are not up-to-date, but their
+           output is shown in the same order they are given. The cmds are shown
+           before launching them
+
+           It returns whether a bib tool was effectively used or not
+
+        """
+
         # if no bib entries have to be processed return immediately
         if not self._tool or self._tool == "":
             return False
 
-        # first things first, run the tool and show the cmd in spite of the
-        # value of quiet
-        print(f' {self._tool} {bibfile.stem}')
-        sproc = subprocess.Popen(
-            shlex.split(f'{self._tool} {bibfile.stem}'),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        # update the fingerprint of all the bib directives
+        self._fingerprint = hash_bibfiles(self._bibfile, self._tool, self._encoding)
+
+        # in case the bib directives of a bibunit did not change since the last
+        # successful execution of the bib tool over it and its output is up to
+        # date, then skip it
+        pending = []
+        for ibibfile in bibfiles:
+            fingerprint = hash_bibunit(ibibfile, self._tool)
+            if is_up_to_date(ibibfile, self._tool, fingerprint, self._encoding):
+                print(INFO_UP_TO_DATE.format(self._tool, ibibfile.stem))
+            else:
+                pending.append((ibibfile, fingerprint))
+        if len(pending) == 0:
+            return False
+
+        # run the tool over all bibunits. subprocess is imported only when the
+        # bib tool is effectively invoked. Every execution is independent of
+        # the others, and they release the GIL while waiting, so that threads
+        # are used to overlap them
+        import subprocess
+
+        def execute(bibfile: Path) -> subprocess.CompletedProcess:
+            return subprocess.run(self._argv_prefix + [bibfile.stem], capture_output=True, check=False)
+
+        # the cmds are shown before launching them in spite of the value of
+        # quiet, so that it is known what is being run while waiting
+        for (ibibfile, _) in pending:
+            print(f' {self._tool} {ibibfile.stem}')
+
+        if len(pending) == 1:
+            results = [execute(pending[0][0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(MAX_RUN_WORKERS, len(pending))) as executor:
+                results = list(executor.map(execute, [ibibfile for (ibibfile, _) in pending]))
+
+        # and show the results of every execution in order. In case there are
+        # several, every result is preceded by the bibunit it belongs to
+        for (ibibfile, ifingerprint), iresult in zip(pending, results):
+            self._show_result(ibibfile, iresult, ifingerprint, len(pending) > 1)
+
+        return True
+
+    def _show_result(self, bibfile: Path, result, fingerprint: str, header: bool = False):
+        """Show the result of processing the given bib file, preceded by its
+           name if header is True, and store the given fingerprint of the
+           bibunit in case it was successful
+
+        """
+
+        # show the bibunit in spite of the value of quiet
+        if header:
+            print(f' {bibfile.stem}:')
 
         # get both the standard output and standard error decoded under the
         # specified encoding schema
-        out_bytes, err_bytes = sproc.communicate()
-        self._stdout = out_bytes.decode(encoding=self._encoding, errors="replace")
-        self._stderr = err_bytes.decode(encoding=self._encoding, errors="replace")
-        self._return_code = sproc.returncode
+        self._stdout = result.stdout.decode(encoding=self._encoding, errors="replace")
+        self._stderr = result.stderr.decode(encoding=self._encoding, errors="replace")
+        self._return_code = result.returncode
 
         # show all lines of the standard output indented in spite of the value
         # of quiet. The main reason is that parsing the output or the files
         # generated is not easy and there is a risk that warnings/errors are
         # ignored by the user
-        for iline in self._stdout.splitlines():
-            print(f"\t{iline}")
-
-        # update the fingerprint
-        self._fingerprint = hash_bibfiles(self._bibfile, self._tool, self._encoding)
+        if (lines := self._stdout.splitlines()):
+            sys.stdout.write('\t' + '\n\t'.join(lines) + '\n')
 
         # check whether there are any errors
         if self._return_code != 0:
             print(" Errors found!")
-            for iline in self._stderr.splitlines():
-                print(f"\t{iline}")
+            if (lines := self._stderr.splitlines()):
+                sys.stdout.write('\t' + '\n\t'.join(lines) + '\n')
         else:
 
+            # and only if the execution was successful, store the fingerprint
+            # to skip the bib tool in forthcoming executions
+            bibfile.with_suffix(BIBHASH_SUFFIX).write_text(fingerprint, encoding=self._encoding)
+
             if not self._quiet:
                 print(" No errors found")
 
@@ -309,8 +669,6 @@ class Bibtool:
         if not self._quiet:
             print()
 
-        return True
-
 
 # Local Variables:
 # mode:python
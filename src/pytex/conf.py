@@ -16,6 +16,10 @@ Configuration data
 # constants
 # -----------------------------------------------------------------------------
 
+# default maximum number of times the processor is run, even if it still
+# recommends re-running the files
+DEFAULT_MAX_NB_CYCLES = 5
+
 # The following string has been generated from the typical .gitignore file of
 # LaTeX projects. It contains most entries found there (with a few exceptions
 # being removed, such as for example the ancilliary files generated by editors
@@ -248,8 +252,21 @@ pythontex-files-*/
 
 # xwatermark package
 *.xwm
+
+## pytex:
+# fingerprints of the bib directives
+*.pytex-bibhash
+
+# fingerprints of the inputs of the last build
+*.pytex-buildhash
 """
 
+# Patterns which can produce an arbitrary number of matches are only applied to
+# files and directories whose name contains the name of the texfile. The
+# following ones, instead, are applied to all of them, since these files are
+# written for every bibunit, whatever its name is
+ANCILLIARY_ANY_NAME = ("*.pytex-bibhash",)
+
 
 # Local Variables:
 # mode:python
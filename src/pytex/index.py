@@ -17,10 +17,13 @@ the standard output and the standard error
 # imports
 # -----------------------------------------------------------------------------
 import hashlib
+import os
 import re
-import shlex
 import subprocess
+import sys
+import threading
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
@@ -31,20 +34,180 @@ from pathlib import Path
 WARNING_DIFFERENT_TOOL = " {} was given to process the indices and it will be used, but it is recommended to use {} instead"
 WARNING_NO_INDEX_FILES = " No index files found with tool {}"
 
+# size of the blocks used to read files when computing their fingerprint
+HASH_BLOCK_SIZE = 64 * 1024
+
+# maximum number of threads used to read and scan idx files concurrently
+MAX_SCAN_WORKERS = 8
+
 # regular expressions
 
 # The following regular expression matches index directives which are extracted
-# to compute the fingerprint of the indices
-RE_INDEX = re.compile(r'\\indexentry(?:\[[^]]+\])?\{.*\}\{.*\}\s*')
-
-# The following regular expressions intentionally distinguish between tagged and
-# untagged index entries
-RE_TAGGED_INDEX_ENTRY = r'^\s*\\indexentry\[[^]]+\]'
-RE_UNTAGGED_INDEX_ENTRY = r'^\s*\\indexentry\{'
+# to compute the fingerprint of the indices. It is applied directly over the raw
+# contents of the index files, so that they do not have to be decoded. Every
+# directive is written in a line of its own, and its arguments might contain
+# nested braces, so that the whole line is taken. Note that no quantifier
+# overlaps with the expression that follows it, so that no backtracking is ever
+# necessary
+RE_INDEX_B = re.compile(rb'\\indexentry(?:\[[^]\n]*\])?\{[^\n]*')
+
+# The following regular expression intentionally distinguishes between tagged
+# and untagged index entries in a single pass: the group which matched tells
+# the kind of every entry. It is applied over the raw contents of the index
+# files only when the entries are not found at the beginning of a line (see
+# _index_entry_kinds)
+RE_INDEX_ENTRY = re.compile(rb'^\s*\\indexentry(?:(?P<tagged>\[[^]]+\])|(?P<untagged>\{))', re.M)
+
+# prefixes of the tagged and untagged index entries
+TAGGED_INDEX_PREFIX = b'\\indexentry['
+UNTAGGED_INDEX_PREFIX = b'\\indexentry{'
+
+# index files smaller than this size can not contain any index entry, so that
+# they are not even read
+MIN_INDEX_FILE_SIZE = len(UNTAGGED_INDEX_PREFIX)
 
 # functions
 # -----------------------------------------------------------------------------
 
+# -----------------------------------------------------------------------------
+# _list_tagged_idx
+#
+# Return the sorted list of paths to the files <filename>-*.idx in the current
+# working directory. A single pass over the directory is performed with
+# os.scandir, so that only those entries that match are turned into paths
+# -----------------------------------------------------------------------------
+def _list_tagged_idx(filename: Path) -> list[Path]:
+    """Return the sorted list of paths to the files <filename>-*.idx in the
+       current working directory. A single pass over the directory is performed
+       with os.scandir, so that only those entries that match are turned into
+       paths
+
+    """
+
+    prefix = f"{filename.stem}-"
+    with os.scandir(Path.cwd()) as entries:
+        return sorted(Path(ientry.path) for ientry in entries
+                      if ientry.name.startswith(prefix) and ientry.name.endswith(".idx"))
+
+
+# -----------------------------------------------------------------------------
+# _index_entry_kinds
+#
+# Return a tuple of two booleans which tell whether the given raw contents of an
+# index file contain tagged and untagged index entries respectively, i.e., lines
+# starting, possibly after some blanks, with \indexentry[...] or \indexentry{.
+# Plain substring searches are used first, and the contents are scanned with a
+# regular expression only once, and only in case any kind of entry is found but
+# not at the beginning of a line
+# -----------------------------------------------------------------------------
+def _index_entry_kinds(data: bytes) -> tuple[bool, bool]:
+    """Return a tuple of two booleans which tell whether the given raw contents
+       of an index file contain tagged and untagged index entries respectively,
+       i.e., lines starting, possibly after some blanks, with
+       \\indexentry[...] or \\indexentry{. Plain substring searches are used
+       first, and the contents are scanned with a regular expression only once,
+       and only in case any kind of entry is found but not at the beginning of
+       a line
+
+    """
+
+    # if a prefix does not appear anywhere, then no entry of that kind exists.
+    # Otherwise, index entries are usually written at the beginning of every
+    # line. Tagged entries, as in the regular expression, are accepted only if
+    # their tag is not empty and it is closed
+    kinds = {}
+    for (kind, prefix) in (("tagged", TAGGED_INDEX_PREFIX),
+                           ("untagged", UNTAGGED_INDEX_PREFIX)):
+        if prefix not in data:
+            kinds[kind] = False
+            continue
+        if data.startswith(prefix):
+            start = len(prefix)
+        elif (start := data.find(b'\n' + prefix)) != -1:
+            start += 1 + len(prefix)
+        else:
+            continue
+        if kind == "untagged" or \
+           (data[start:start + 1] not in (b']', b'') and data.find(b']', start + 1) != -1):
+            kinds[kind] = True
+
+    # in case any kind remains undecided, check whether its entries are
+    # preceded by blanks, stopping as soon as all kinds are known
+    if len(kinds) < 2:
+        undecided = {"tagged", "untagged"} - kinds.keys()
+        for imatch in RE_INDEX_ENTRY.finditer(data):
+            if imatch.lastgroup in undecided:
+                kinds[imatch.lastgroup] = True
+                undecided.discard(imatch.lastgroup)
+                if not undecided:
+                    break
+
+    return (kinds.get("tagged", False), kinds.get("untagged", False))
+
+
+# -----------------------------------------------------------------------------
+# _analyze_idx
+#
+# Examine all the index files of the given LaTeX file in a single pass, and
+# return both the index tool recommended and the idx files to process in case
+# makeindex is used. See guess_index_tool and guess_index_files for the rules
+# applied in either case
+# -----------------------------------------------------------------------------
+def _analyze_idx(filename: Path, encoding: str) -> tuple[str | None, list[Path]]:
+    """Examine all the index files of the given LaTeX file in a single pass,
+       and return both the index tool recommended and the idx files to process
+       in case makeindex is used. See guess_index_tool and guess_index_files for
+       the rules applied in either case
+
+    """
+
+    # Get a path to the index file and also to the different -*.idx files.
+    # Note the latter are stored in a list so that they can be traversed
+    # several times, and also checked for emptiness
+    idx_main = filename.with_suffix(".idx")
+    tagged_idx = _list_tagged_idx(filename)
+
+    # Read the main .idx file, if any, only once, and check the type of its
+    # entries. Its existence is not checked in advance, as this would require
+    # an additional system call
+    (has_tagged, has_untagged) = (False, False)
+    try:
+        with open(idx_main, 'rb') as stream:
+            data = stream.read()
+    except FileNotFoundError:
+        data = None
+    if data is not None:
+        (has_tagged, has_untagged) = _index_entry_kinds(data)
+
+    # select all -*.idx files with untagged entries
+    untagged_idx = []
+    for idxfile in tagged_idx:
+        if idxfile.stat().st_size < MIN_INDEX_FILE_SIZE:
+            continue
+        data = idxfile.read_bytes()
+        if _index_entry_kinds(data)[1]:
+            untagged_idx.append(idxfile)
+
+    # if the main .idx file contains untagged entries and there are no multiple
+    # -*.idx files, then it is the only one to process with makeindex
+    if has_untagged and not tagged_idx:
+        makeindex_files = [idx_main]
+    else:
+        makeindex_files = untagged_idx
+
+    # if the main .idx file contains tagged entries then splitindex is
+    # recommended; otherwise, makeindex is recommended if there are files to
+    # process with it
+    if has_tagged:
+        return ("splitindex", makeindex_files)
+    if len(makeindex_files) > 0:
+        return ("makeindex", makeindex_files)
+
+    # At this point, it is assumed that no indices are required and None is
+    # returned
+    return (None, makeindex_files)
+
+
 # -----------------------------------------------------------------------------
 # guess_index_tool
 #
@@ -75,37 +238,7 @@ def guess_index_tool(filename: Path, encoding: str) -> str | None:
 
     """
 
-    # Get a path to the index file and also to the different -*.idx files
-    idx_main = filename.with_suffix(".idx")
-    tagged_idx = Path.cwd().glob(f"{filename.stem}-*.idx")
-
-    # In case there is a single .idx file
-    if idx_main.exists():
-        txt = idx_main.read_text(encoding=encoding, errors="replace")
-
-        # if this file contains tagged index entries, then recommend splitindex
-        if re.search(RE_TAGGED_INDEX_ENTRY, txt, flags=re.M) is not None:
-            return "splitindex"
-
-        # otherwise, if there are only untagged entries, then recommend
-        # makeindex
-        if re.search(RE_UNTAGGED_INDEX_ENTRY, txt, flags=re.M) is not None and \
-           not tagged_idx:
-            return "makeindex"
-
-    # In case there are several idx files, and at least one contains untagged
-    # entries
-    if tagged_idx is not None:
-        for idxfile in tagged_idx:
-            txt = idxfile.read_text(encoding=encoding, errors="replace")
-
-            # if this file contains untagged entries, then suggest makeindex
-            if re.search(RE_UNTAGGED_INDEX_ENTRY, txt, flags=re.M) is not None:
-                return "makeindex"
-
-    # At this point, it is assumed that no indices are required and None is
-    # returned
-    return None
+    return _analyze_idx(filename, encoding)[0]
 
 
 # -----------------------------------------------------------------------------
@@ -136,82 +269,115 @@ def guess_index_files(filename: Path, tool: str, encoding: str) -> list[Path]:
 
     """
 
-    # get a path to the current filename and also its .idx cousing
-    idx_main = filename.with_suffix(".idx")
-
     # in case splitindex is given, then a single idx file should be available.
     # Certainly, there should be one .idx file per index, but they should be all
     # summarized in a single idx file.
     if tool == "splitindex":
-        return [idx_main]
+        return [filename.with_suffix(".idx")]
 
-    # in case makeindex is given, then check whether there are a single file to
-    # process or an arbitrary number of them
-    tagged_idx = Path.cwd().glob(f"{filename.stem}-*.idx")
-    if idx_main.exists():
-        txt = idx_main.read_text(encoding=encoding, errors="replace")
+    # otherwise, return the files to process with makeindex
+    return _analyze_idx(filename, encoding)[1]
 
-        # if this file contains untagged entries and there are no multiple
-        # -*.idx files, then return it right away
-        if re.search(RE_UNTAGGED_INDEX_ENTRY, txt, flags=re.M) is not None and \
-           not tagged_idx:
-            return [filename]
 
-    # In case there are several idx files
-    aux_files = []
-    if tagged_idx is not None:
-        for idxfile in tagged_idx:
-            txt = idxfile.read_text(encoding=encoding, errors="replace")
+# -----------------------------------------------------------------------------
+# get_index_styles
+#
+# Return the sorted list of paths to the index styles (*.ist) in the current
+# working directory. They are not named in the index files, so that all of them
+# are returned, as any might be given to the index tool
+# -----------------------------------------------------------------------------
+def get_index_styles() -> list[Path]:
+    """Return the sorted list of paths to the index styles (*.ist) in the
+       current working directory. They are not named in the index files, so
+       that all of them are returned, as any might be given to the index tool
 
-            # if this file contains untagged entries, then add it to the files
-            # to process
-            if re.search(RE_UNTAGGED_INDEX_ENTRY, txt, flags=re.M) is not None:
-                aux_files.append(idxfile)
+    """
 
-    # and return all files
-    return aux_files
+    return sorted(Path('.').glob('*.ist'))
+
+
+# -----------------------------------------------------------------------------
+# new_hash
+#
+# Return a new hash object used to compute fingerprints. Since they are only
+# compared among them, BLAKE2b is used because it is faster than md5
+# -----------------------------------------------------------------------------
+def new_hash(data: bytes = b''):
+    """Return a new hash object used to compute fingerprints. Since they are
+       only compared among them, BLAKE2b is used because it is faster than md5
+
+    """
+
+    return hashlib.blake2b(data, digest_size=16)
+
+
+# -----------------------------------------------------------------------------
+# _scan_idx
+#
+# Return all the index directives found in the given idx file, one per line
+# -----------------------------------------------------------------------------
+def _scan_idx(path: Path) -> bytes:
+    """Return all the index directives found in the given idx file, one per
+       line
+
+    """
+
+    if path.stat().st_size < MIN_INDEX_FILE_SIZE:
+        return b''
+    if (matches := RE_INDEX_B.findall(path.read_bytes())):
+        return b'\n'.join(matches) + b'\n'
+    return b''
 
 
 # -----------------------------------------------------------------------------
 # hash_index_files
 #
-# Return a md5 hash code that provides a blueprint of the last processing of the
-# indices. This blueprint is used later to determine whether the index tool has to
-# be run again, or not.
+# Return a BLAKE2b hash code that provides a blueprint of the last processing
+# of the indices. This blueprint is used later to determine whether the index
+# tool has to be run again, or not.
 # -----------------------------------------------------------------------------
 def hash_index_files(filename: Path, tool: str, encoding: str) -> str:
-    """Return a md5 hash code that provides a blueprint of the last processing
-       of the indices. This blueprint is used later to determine whether the
-       index tool has to be run again, or not.
+    """Return a BLAKE2b hash code that provides a blueprint of the last
+       processing of the indices. This blueprint is used later to determine
+       whether the index tool has to be run again, or not.
 
     """
 
     # First, get the files to process
     idx_files = guess_index_files(filename, tool, encoding)
 
-    # in case splitindex is used, just return the md5 hash code of the idx file
+    # in case splitindex is used, just return the hash code of the raw
+    # contents of the idx file. Since Python 3.11 this is entirely done by
+    # hashlib; otherwise, the file is read in blocks of a fixed size
     if tool == "splitindex":
-        txt = idx_files[0].read_text(encoding=encoding, errors="ignore")
-        return hashlib.md5(txt.encode(encoding)).hexdigest()
+        with open(idx_files[0], 'rb') as stream:
+            if sys.version_info >= (3, 11):
+                return hashlib.file_digest(stream, new_hash).hexdigest()
 
-    # if makeindex is used, then process all files and build a string which
-    # contains only lines with \indexentry
-    if tool == "makeindex":
+            digest = new_hash()
+            while block := stream.read(HASH_BLOCK_SIZE):
+                digest.update(block)
+            return digest.hexdigest()
 
-        contents = ""
-        for aux_path in idx_files:
-            txt = aux_path.read_text(encoding=encoding, errors="ignore")
+    # if makeindex is used, then process the raw contents of all files and feed
+    # the hash code incrementally only with lines with \indexentry
+    if tool == "makeindex":
 
-            # and now get all the index directives in this file
-            idx_contents = ""
-            for m in RE_INDEX.finditer(txt):
-                idx_contents += m.group(0) + '\n'
+        # the files are independent from each other and both reading and
+        # scanning them release the GIL, so that several files are processed
+        # concurrently. The order of the files is preserved anyway
+        if len(idx_files) > 1:
+            with ThreadPoolExecutor(max_workers=min(MAX_SCAN_WORKERS, len(idx_files))) as executor:
+                parts = list(executor.map(_scan_idx, idx_files))
+        else:
+            parts = [_scan_idx(idx_path) for idx_path in idx_files]
 
-            # and add it to the overall contents
-            contents += idx_contents
+        digest = new_hash()
+        for part in parts:
+            digest.update(part)
 
-        # and return the md5 hash code
-        return hashlib.md5(contents.encode(encoding)).hexdigest()
+        # and return the hash code
+        return digest.hexdigest()
 
     # This should never happen but ...
     return ""
@@ -263,11 +429,7 @@ class Idxtool:
         if self._tool is not None and self._tool != "" and len(self._idx_files) == 0:
             print(WARNING_NO_INDEX_FILES.format(self._tool))
 
-        # in case that no tool has been specifically given, then guess it
-        if not tool or tool == "":
-            self._tool = guess_index_tool(texfile, encoding)
-
-        # also, the index directives are summarized in a md5 hash code to check
+        # also, the index directives are summarized in a hash code to check
         # whether it is necessary to run the index tool again. This is computed
         # after every execution of the index tool
         self._fingerprint = ""
@@ -308,32 +470,45 @@ class Idxtool:
         if not self._tool or self._tool == "":
             return False
 
-        # update the fingerprint
+        # update the fingerprint of the index files
         self._fingerprint = hash_index_files(self._idxfile, self._tool, self._encoding)
 
         # first things first, run the tool in spite of the value of quiet
         print(f' {self._tool} {idxfile.stem}')
         sproc = subprocess.Popen(
-            shlex.split(f'{self._tool} {idxfile.stem}'),
+            [self._tool, idxfile.stem],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
+            encoding=self._encoding,
+            errors="replace",
+            bufsize=1,
         )
 
-        # get both the standard output and standard error decoded under the
-        # specified encoding schema
-        out_bytes, err_bytes = sproc.communicate()
-        self._stdout = out_bytes.decode(encoding=self._encoding, errors="replace")
-        self._stderr = err_bytes.decode(encoding=self._encoding, errors="replace")
-        self._return_code = sproc.returncode
-
-        # show all lines of the standard output indented in spite of the value
-        # of quiet. The main reason is that parsing the output or the files
-        # generated is not easy and there is a risk that warnings/errors are
-        # ignored by the user
-        for iline in self._stdout.splitlines():
-            print(f"\t{iline}")
-        for iline in self._stderr.splitlines():
-            print(f"\t{iline}")
+        # the standard error is drained in a separate thread so that the
+        # subprocess never blocks on a full pipe while the standard output is
+        # being read
+        err_lines = []
+        err_reader = threading.Thread(target=lambda: err_lines.extend(sproc.stderr))
+        err_reader.start()
+
+        # show all lines of the standard output indented as soon as they are
+        # produced, in spite of the value of quiet. The main reason is that
+        # parsing the output or the files generated is not easy and there is a
+        # risk that warnings/errors are ignored by the user
+        out_lines = []
+        for iline in sproc.stdout:
+            out_lines.append(iline)
+            print(f"\t{iline}", end='' if iline.endswith('\n') else '\n')
+
+        # wait for the subprocess to finish and show also its standard error
+        err_reader.join()
+        self._return_code = sproc.wait()
+        for iline in err_lines:
+            print(f"\t{iline}", end='' if iline.endswith('\n') else '\n')
+
+        # and keep both the standard output and error
+        self._stdout = "".join(out_lines)
+        self._stderr = "".join(err_lines)
 
         # check whether there are any errors
         if self._return_code != 0:
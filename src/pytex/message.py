@@ -34,6 +34,10 @@ ERROR_UNKNOWN_MESSAGE_SPECIFICATION = "[Message] Unknown format specification: '
 class Message:
     """Definition of any of the types of message acknowledged by this script"""
 
+    # messages are created in large numbers, so that their attributes are
+    # stored in slots instead of a per-instance dictionary
+    __slots__ = ('_mode', '_info', '_name', '_path', '_line')
+
     def __init__(self, mode: str = "", info: str = "", name: str = "",
                  path: str = "", line: str = ""):
         """A message might consist of an arbitrary number of fields given
@@ -56,6 +60,11 @@ class Message:
             self._path == other.get_path() and \
             self._line == other.get_line()
 
+    def __hash__(self):
+        """Return a hash code of the information contained in this instance"""
+
+        return hash((self._mode, self._info, self._name, self._path, self._line))
+
     def __format__(self, spec: str = ""):
         """Provides a tailored representation of the contents of this instance.
 
@@ -116,8 +125,10 @@ class Messages:
 
         # initialize the attributes
 
-        # members are initialized empty
-        self._members = []
+        # members are initialized empty. They are stored as the keys of a
+        # dictionary so that membership is checked in constant time while the
+        # order of insertion is preserved
+        self._members: dict[Message, None] = {}
 
     def __contains__(self, other: Message):
         """Return True if and only if the given Message exists in this container"""
@@ -135,18 +146,13 @@ class Messages:
            If an unknown specification is given, an exception is raised
         """
 
-        output = ""
-        for imember in self._members:
-            output += imember.__format__(spec)
-        return output
+        return "".join(imember.__format__(spec) for imember in self._members)
 
     def __iadd__(self, other: Message):
         """Add the given message to the corresponding container"""
 
         # in case the given message already exists, skip
-        if other in self:
-            return self
-        self._members.append(other)
+        self._members.setdefault(other, None)
 
         return self
 
@@ -17,16 +17,30 @@ standard output and the standard error
 
 # imports
 # -----------------------------------------------------------------------------
+import contextlib
+import hashlib
+import mmap
 import re
 import os
-import shlex
+import selectors
+import shutil
 import subprocess
+import sys
+import threading
 
 from collections import defaultdict
 from pathlib import Path
 
 from . import message
 
+# google-re2 provides a regular expression engine which runs in linear time. It
+# is used, if available, to scan the .log files. Otherwise, the standard re
+# module is used instead
+try:
+    import re2 as re_log
+except ImportError:
+    re_log = re
+
 # constants
 # -----------------------------------------------------------------------------
 
@@ -36,6 +50,38 @@ INFO_NO_ERROR_FOUND = " No errors found"
 # Warning messages
 WARNING_NO_FILE_FOUND = " Warning: no file found with the name {}"
 
+# options given to the processor. Batch mode is used since all the information
+# is taken from the .log file, so that nothing has to be written to the terminal
+PROCESSOR_OPTIONS = ["-interaction=batchmode", "-halt-on-error", "-file-line-error", "-recorder"]
+
+# option given to every processor to run in draft mode, i.e., without
+# generating the output file
+DRAFT_OPTIONS = {"latex": "-draftmode", "pdflatex": "-draftmode", "lualatex": "-draftmode", "xelatex": "-no-pdf"}
+
+# size of the chunks read from the pipes of the processor
+PIPE_CHUNK_SIZE = 64 * 1024
+
+# size of the tail of the log file where the recommendations to re-run the
+# files are looked for first
+RERUN_TAIL_SIZE = 64 * 1024
+
+# size of the blocks used to read files when computing their fingerprint
+HASH_BLOCK_SIZE = 64 * 1024
+
+# prefixes of the lines of the .fls file which record the files read and
+# written by the processor
+FLS_INPUT_PREFIX = b'INPUT '
+FLS_OUTPUT_PREFIX = b'OUTPUT '
+
+# suffixes of the files written by the processor which are not read back in
+# forthcoming passes, and thus they do not tell whether another pass would
+# produce different results
+FINAL_OUTPUT_SUFFIXES = (".log", ".fls", ".pdf", ".dvi", ".xdv", ".gz")
+
+# suffix of the files used to store the fingerprint of the inputs of the last
+# successful build
+BUILDHASH_SUFFIX = ".pytex-buildhash"
+
 # Error messages
 ERROR_NO_ERROR_FOUND = " No errors were found, but the return code is non-null. Inspect the .log file!"
 
@@ -43,7 +89,7 @@ ERROR_NO_ERROR_FOUND = " No errors were found, but the return code is non-null.
 # regular expressions
 
 # Re-running regexp
-RE_RERUN = re.compile(r'(?:LaTeX|Package(?:\s+\w+)?)\s+Warning:(.*\bRerun\b.*|\s+There were undefined (?:references|citations))')
+RE_RERUN = re_log.compile(rb'(?:LaTeX|Package(?:\s+\w+)?)\s+Warning:(.*\bRerun\b.*|\s+There were undefined (?:references|citations))')
 
 # Warning regexp
 RE_WARNING_INPUT = re.compile(r'\((?P<filename>\.[^\.]+)(?P<suffix>\.[^\.\s)]+)')
@@ -51,17 +97,321 @@ RE_WARN_GENERIC = re.compile(
     r'(?P<mode>LaTeX|Package|Class)\s+(?P<name>.+)?\s*Warning:\s*(?P<msg>.+?)$',
     re.M,
 )
-RE_COMBINED_INPUT_WARN_GENERIC = re.compile(
-    r'\((?P<filename>\.[^\.]+)(?P<suffix>\.[^\.\s)]+)|(?P<mode>LaTeX|Package|Class)\s+(?P<name>.+)?\s*Warning:\s*(?P<msg>.+?)$',
-    re.M,
-)
 RE_OVERUNDER = re.compile(
     r'^(?P<type>Over|Under)full \\hbox .*? at lines? (?P<line1>\d+)(?:--(?P<line2>\d+))?',
     re.M,
 )
 
-# Error regexp
-RE_ERROR = re.compile(r'(?ms)^(?P<path>(?:/|~/|\./|\../)?(?:[^\s/\r\n]+/)*[^\s/\r\n]+\.[^\s./\r\n]+):(?P<line>\d+)(?P<body>.*?)(?=\r?\n\s*\r?\n|\Z)')
+# Text regexps used to normalize the messages: runs of blanks and newlines which
+# are not followed by another newline
+RE_MULTISPACE = re.compile(r' {2,}')
+RE_SINGLE_NL = re.compile(r'\n(?!\n)')
+
+# Error regexp. The body of the error spans over all lines until the first blank
+# one. It is written without lookaheads or lazy quantifiers, so that it can be
+# run by engines that never backtrack
+RE_ERROR = re_log.compile(rb'(?m)^(?P<path>(?:/|~/|\./|\../)?(?:[^\s/\r\n]+/)*[^\s/\r\n]+\.[^\s./\r\n]+):(?P<line>\d+)(?P<body>[^\r\n]*(?:\r?\n[^\S\r\n]*[^\s][^\r\n]*)*)')
+
+# Input and warning regexps. LaTeX warnings usually span over several lines, and
+# thus the name and the message of every warning match any text but blank lines.
+# The newlines captured are then replaced with blanks (see unwrap_lines),
+# exactly as if the lines of every paragraph had been joined before
+RE_LOG_INPUT = re_log.compile(rb'\((?P<filename>\.[^\.]+)(?P<suffix>\.[^\.\s)]+)')
+RE_LOG_WARNING = re_log.compile(rb'(?P<mode>LaTeX|Package|Class)\s+(?P<name>[^\n]+(?:\n[^\n]+)*)?\s*Warning:\s*(?P<msg>[^\n]+(?:\n[^\n]+)*)')
+
+# Input files and warnings are recognized with separate scanners, whose matches
+# are merged (see scan_log). In case two matches start at the same position, the
+# first scanner in this list takes precedence. Errors are always searched for on
+# their own over the whole log, as they might directly follow a warning
+(LOG_INPUT, LOG_WARNING) = range(2)
+LOG_SCANNERS = (RE_LOG_INPUT, RE_LOG_WARNING)
+
+
+# functions
+# -----------------------------------------------------------------------------
+
+# -----------------------------------------------------------------------------
+# unwrap_lines
+#
+# Return a copy of the given text where every newline which is not followed by
+# another newline is replaced with a blank, i.e., lines are joined within every
+# paragraph. This is done only with str.replace: newlines followed by another
+# newline are marked with a sentinel (three passes are required because
+# replacements do not overlap), the rest are turned into blanks and the
+# sentinels are restored as newlines
+# -----------------------------------------------------------------------------
+def unwrap_lines(text: str) -> str:
+    """Return a copy of the given text where every newline which is not
+       followed by another newline is replaced with a blank, i.e., lines are
+       joined within every paragraph. This is done only with str.replace:
+       newlines followed by another newline are marked with a sentinel (three
+       passes are required because replacements do not overlap), the rest are
+       turned into blanks and the sentinels are restored as newlines
+
+    """
+
+    # the sentinel can not be used if it already appears in the text
+    if '\0' in text:
+        return RE_SINGLE_NL.sub(' ', text)
+
+    # after the first pass, runs of an even number of newlines are marked as
+    # (sentinel, newline) pairs, which are merged by the second pass. Runs of an
+    # odd number of newlines still end with two newlines, and the third pass
+    # marks the first one
+    text = text.replace('\n\n', '\0\n').replace('\n\0', '\0\0').replace('\n\n', '\0\n')
+    return text.replace('\n', ' ').replace('\0', '\n')
+
+
+# -----------------------------------------------------------------------------
+# map_log_file
+#
+# Return a context manager with the raw contents of the given log file, opened
+# in binary mode. The file is mapped into memory so that it is scanned without
+# being copied nor decoded. Empty files can not be mapped, and logs written with
+# carriage returns are copied with their newlines normalized, as if they had
+# been read in text mode
+# -----------------------------------------------------------------------------
+def map_log_file(stream):
+    """Return a context manager with the raw contents of the given log file,
+       opened in binary mode. The file is mapped into memory so that it is
+       scanned without being copied nor decoded. Empty files can not be mapped,
+       and logs written with carriage returns are copied with their newlines
+       normalized, as if they had been read in text mode
+
+    """
+
+    if os.fstat(stream.fileno()).st_size == 0:
+        return contextlib.nullcontext(b'')
+
+    data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    if data.find(b'\r') < 0:
+        return data
+
+    with data:
+        return contextlib.nullcontext(data[:].replace(b'\r\n', b'\n').replace(b'\r', b'\n'))
+
+
+# -----------------------------------------------------------------------------
+# scan_log
+#
+# Return an iterator over the matches of the given scanners in the given data,
+# as tuples (kind, match) where kind is the index of the scanner. Matches are
+# returned in order and do not overlap, exactly as if all scanners were the
+# alternatives of a single regexp: the leftmost match is taken every time, and
+# any other match that overlaps with it is searched for again after its end
+# -----------------------------------------------------------------------------
+def scan_log(data, scanners):
+    """Return an iterator over the matches of the given scanners in the given
+       data, as tuples (kind, match) where kind is the index of the scanner.
+       Matches are returned in order and do not overlap, exactly as if all
+       scanners were the alternatives of a single regexp: the leftmost match is
+       taken every time, and any other match that overlaps with it is searched
+       for again after its end
+
+    """
+
+    matches = [scanner.search(data) for scanner in scanners]
+    while True:
+
+        # take the leftmost match. In case of ties, the first one is taken
+        kind = None
+        for (index, imatch) in enumerate(matches):
+            if imatch is not None and (kind is None or imatch.start() < matches[kind].start()):
+                kind = index
+        if kind is None:
+            return
+
+        m = matches[kind]
+        yield (kind, m)
+
+        # and search again all matches that start before the end of this one
+        for (index, imatch) in enumerate(matches):
+            if imatch is not None and imatch.start() < m.end():
+                matches[index] = scanners[index].search(data, m.end())
+
+
+# -----------------------------------------------------------------------------
+# read_pipes
+#
+# Read incrementally both the standard output and the standard error of the
+# given subprocess until they are closed, and return their raw contents. Chunks
+# are read as soon as they are available, so that neither pipe can fill up and
+# block the subprocess. On Windows, pipes can not be waited for with selectors,
+# and one thread is used per pipe instead
+# -----------------------------------------------------------------------------
+def read_pipes(sproc: subprocess.Popen) -> tuple[bytes, bytes]:
+    """Read incrementally both the standard output and the standard error of
+       the given subprocess until they are closed, and return their raw
+       contents. Chunks are read as soon as they are available, so that
+       neither pipe can fill up and block the subprocess. On Windows, pipes can
+       not be waited for with selectors, and one thread is used per pipe
+       instead
+
+    """
+
+    buffers = {sproc.stdout: bytearray(), sproc.stderr: bytearray()}
+
+    if sys.platform == "win32":
+
+        def drain(stream):
+            for chunk in iter(lambda: stream.read1(PIPE_CHUNK_SIZE), b''):
+                buffers[stream] += chunk
+
+        readers = [threading.Thread(target=drain, args=(stream,)) for stream in buffers]
+        for ireader in readers:
+            ireader.start()
+        for ireader in readers:
+            ireader.join()
+
+    else:
+        with selectors.DefaultSelector() as selector:
+            for stream in buffers:
+                selector.register(stream, selectors.EVENT_READ)
+
+            # read from every pipe which is ready until all of them are closed
+            while selector.get_map():
+                for (key, _) in selector.select():
+                    if (chunk := key.fileobj.read1(PIPE_CHUNK_SIZE)):
+                        buffers[key.fileobj] += chunk
+                    else:
+                        selector.unregister(key.fileobj)
+
+    return (bytes(buffers[sproc.stdout]), bytes(buffers[sproc.stderr]))
+
+
+# -----------------------------------------------------------------------------
+# _recorded_files
+#
+# Return the files in the current working directory recorded in the .fls file
+# of the given texfile in lines with the given prefix, without repetitions and
+# in the same order they were recorded, or None if the .fls file does not exist
+# -----------------------------------------------------------------------------
+def _recorded_files(texfile: Path, prefix: bytes) -> list[str] | None:
+    """Return the files in the current working directory recorded in the .fls
+       file of the given texfile in lines with the given prefix, without
+       repetitions and in the same order they were recorded, or None if the
+       .fls file does not exist
+
+    """
+
+    try:
+        with open(texfile.with_suffix(".fls"), 'rb') as stream:
+            lines = stream.read().splitlines()
+    except OSError:
+        return None
+
+    cwd = os.getcwd()
+    names = {}
+    for iline in lines:
+        if iline.startswith(prefix):
+            # absolute paths on a different drive are never under cwd
+            name = os.path.normpath(os.fsdecode(iline[len(prefix):]))
+            if not os.path.isabs(name) or Path(name).is_relative_to(cwd):
+                names[name] = None
+
+    return list(names)
+
+
+# -----------------------------------------------------------------------------
+# _hash_files
+#
+# Return a fingerprint of the names and contents of the given files, starting
+# from the given data, or the empty string if any of them can not be read
+# -----------------------------------------------------------------------------
+def _hash_files(names: list[str], data: bytes = b'') -> str:
+    """Return a fingerprint of the names and contents of the given files,
+       starting from the given data, or the empty string if any of them can not
+       be read
+
+    """
+
+    # the contents of every file are read in blocks of a fixed size
+    fingerprint = hashlib.blake2b(data, digest_size=16)
+    for iname in names:
+        try:
+            with open(iname, 'rb') as stream:
+                fingerprint.update(os.fsencode(iname) + b'\0')
+                while block := stream.read(HASH_BLOCK_SIZE):
+                    fingerprint.update(block)
+        except OSError:
+            return ""
+
+    return fingerprint.hexdigest()
+
+
+# -----------------------------------------------------------------------------
+# hash_inputs
+#
+# Return a fingerprint of the files read by the processor in its last run, as
+# recorded in the .fls file, along with the given extra files (e.g., bib
+# databases). The name of the processor is also taken into account. Only files
+# in the current working directory are considered, so that the files of the
+# TeX distribution are not read. If the .fls file does not exist or any file
+# can not be read, the empty string is returned
+# -----------------------------------------------------------------------------
+def hash_inputs(texfile: Path, processor: str, extra: list[Path]) -> str:
+    """Return a fingerprint of the files read by the processor in its last
+       run, as recorded in the .fls file, along with the given extra files
+       (e.g., bib databases). The name of the processor is also taken into
+       account. Only files in the current working directory are considered, so
+       that the files of the TeX distribution are not read. If the .fls file
+       does not exist or any file can not be read, the empty string is returned
+
+    """
+
+    if (inputs := _recorded_files(texfile, FLS_INPUT_PREFIX)) is None:
+        return ""
+
+    extra_names = [os.path.normpath(ipath) for ipath in extra]
+    return _hash_files(inputs + [iname for iname in extra_names if iname not in inputs],
+                       processor.encode())
+
+
+# -----------------------------------------------------------------------------
+# hash_outputs
+#
+# Return a fingerprint of the files written by the processor in its last run
+# which are read back in forthcoming passes (e.g., .aux or .toc files), as
+# recorded in the .fls file. If the .fls file does not exist or any file can
+# not be read, the empty string is returned
+# -----------------------------------------------------------------------------
+def hash_outputs(texfile: Path) -> str:
+    """Return a fingerprint of the files written by the processor in its last
+       run which are read back in forthcoming passes (e.g., .aux or .toc
+       files), as recorded in the .fls file. If the .fls file does not exist or
+       any file can not be read, the empty string is returned
+
+    """
+
+    if (outputs := _recorded_files(texfile, FLS_OUTPUT_PREFIX)) is None:
+        return ""
+
+    return _hash_files([iname for iname in outputs if not iname.endswith(FINAL_OUTPUT_SUFFIXES)])
+
+
+# -----------------------------------------------------------------------------
+# is_up_to_date
+#
+# Return whether the given texfile does not need to be processed again. This
+# happens only in case the given fingerprint is not empty and it is the same
+# than the one stored after the last successful build, and the pdf file exists
+# -----------------------------------------------------------------------------
+def is_up_to_date(texfile: Path, fingerprint: str) -> bool:
+    """Return whether the given texfile does not need to be processed again.
+       This happens only in case the given fingerprint is not empty and it is
+       the same than the one stored after the last successful build, and the
+       pdf file exists
+
+    """
+
+    if fingerprint == "" or not texfile.with_suffix(".pdf").exists():
+        return False
+
+    try:
+        return texfile.with_suffix(BUILDHASH_SUFFIX).read_text().strip() == fingerprint
+    except OSError:
+        return False
+
 
 # classes
 # -----------------------------------------------------------------------------
@@ -81,8 +431,14 @@ class ProcessorWarnings:
 
         # There are three different types of warning: latex, package and class.
         # Each one is also categorized by their name, and hence they are stored
-        # separately as dictionaries.
-        (self._latex, self._package, self._class) = (defaultdict(list), defaultdict(list), defaultdict(list))
+        # separately as dictionaries. The messages of every name are stored as
+        # the keys of another dictionary, so that membership is checked in
+        # constant time while the order of insertion is preserved
+        (self._latex, self._package, self._class) = (defaultdict(dict), defaultdict(dict), defaultdict(dict))
+
+        # the number of messages stored is updated every time a new one is
+        # added
+        self._count = 0
 
     def __contains__(self, other: message.Message):
         """Return True if and only if the given Message exists in this container"""
@@ -93,6 +449,7 @@ class ProcessorWarnings:
             return other in self._package[other.get_name()]
         if other.get_mode() == "Class":
             return other in self._class[other.get_name()]
+        return False
 
     def __format__(self, spec: str = ""):
         """Provides a tailored representation of the contents of this instance.
@@ -105,24 +462,24 @@ class ProcessorWarnings:
            If an unknown specification is given, an exception is raised
         """
 
-        output = ""
+        parts: list[str] = []
 
         # First, show the package messages
         for iname in self._package:
             for imessage in self._package[iname]:
-                output += imessage.__format__(spec) + '\n'
+                parts.append(imessage.__format__(spec))
 
         # Next, the class messages
         for iname in self._class:
             for imessage in self._class[iname]:
-                output += imessage.__format__(spec) + '\n'
+                parts.append(imessage.__format__(spec))
 
         # Finally, the latex messages
         for iname in self._latex:
             for imessage in self._latex[iname]:
-                output += imessage.__format__(spec) + '\n'
+                parts.append(imessage.__format__(spec))
 
-        return output
+        return '\n'.join(parts) + ('\n' if parts else '')
 
     def __iadd__(self, other: message.Message):
         """Add the given message to the corresponding container"""
@@ -132,20 +489,21 @@ class ProcessorWarnings:
             return self
 
         if other.get_mode() == "LaTeX":
-            self._latex[other.get_name()].append(other)
+            self._latex[other.get_name()][other] = None
         elif other.get_mode() == "Package":
-            self._package[other.get_name()].append(other)
-        if other.get_mode() == "Class":
-            self._class[other.get_name()].append(other)
+            self._package[other.get_name()][other] = None
+        elif other.get_mode() == "Class":
+            self._class[other.get_name()][other] = None
+        else:
+            return self
 
+        self._count += 1
         return self
 
     def __len__(self):
         """Return the number of messages stored in this container"""
 
-        return len(self._latex) + \
-            len(self._package) + \
-            len(self._class)
+        return self._count
 
 
 # -----------------------------------------------------------------------------
@@ -173,9 +531,20 @@ class Processor:
         # copy the attributes
         (self._texfile, self._processor, self._encoding, self._quiet) = (texfile, processor, encoding, quiet)
 
+        # the name of the .log file is computed only once
+        self._log_filename = texfile.with_suffix(".log")
+
+        # and so are the command lines used to invoke the processor, both in
+        # normal and draft mode. The full path to the binary is used, so that
+        # subprocess can spawn it with posix_spawn instead of fork and exec
+        binary = shutil.which(processor) or processor
+        self._argv = [binary, *PROCESSOR_OPTIONS, str(texfile)]
+        self._draft_argv = [binary, *PROCESSOR_OPTIONS, DRAFT_OPTIONS.get(processor, "-draftmode"), str(texfile)]
+
         # also, initialize other attributes that might be required later for
-        # other services
-        (self._stdout, self._stderr, self._return_code) = ("", "", 0)
+        # other services. The standard output and error are stored as raw bytes
+        # and they are decoded only when requested
+        (self._stdout, self._stderr, self._return_code) = (b"", b"", 0)
 
         # as a result of processing the output generated a number of warnings
         # might be issued. These are stored as a dictionary indexed by the
@@ -188,6 +557,10 @@ class Processor:
         # the same warning in case it happens when processing different files
         self._global_warnings = message.Messages()
 
+        # the fingerprints (mode, name, info) of all warnings found so far are
+        # kept in a set, so that duplicates are discarded with a single probe
+        self._seen: set[tuple[str, str, str]] = set()
+
         # warnings must be shown in the same order they appeared. For this, the
         # names of all files being processed is stored separately. Note that the
         # blank string is added first which stands for those warnings that might
@@ -211,6 +584,11 @@ class Processor:
         # processed the given tex file
         self._nbcycles = 0
 
+        # warnings are only parsed when the processor does not recommend
+        # re-running the files, because otherwise they are discarded in the next
+        # run. This flag tells whether the warnings of the last run were parsed
+        self._warnings_parsed = False
+
     def get_errors(self) -> list[message.Message]:
         """Return all errors generated during this process"""
 
@@ -244,18 +622,34 @@ class Processor:
 
         return self._return_code
 
+    def get_stderr(self) -> str:
+        """Return the standard error of the last run decoded under the
+        specified encoding"""
+
+        return self._stderr.decode(encoding=self._encoding, errors="replace")
+
+    def get_stdout(self) -> str:
+        """Return the standard output of the last run decoded under the
+        specified encoding"""
+
+        return self._stdout.decode(encoding=self._encoding, errors="replace")
+
     def get_warnings(self, key: str|None = None):
         """Return all warnings. In case a key is provided, return only the
-        warnings for that specific key"""
+        warnings for that specific key, or None if there are none"""
 
         if key is not None:
-            return self._warnings[key]
+            return self._warnings.get(key)
         return self._warnings
 
-    def run(self):
-        """Opens a pipe to the binary to process the LaTeX file, compiles the
-           given file and encodes both the standard output and error under the
-           specified encoding
+    def run(self, draft: bool = False):
+        """Opens a pipe to the binary to process the LaTeX file and compiles
+           the given file. Both the standard output and error are kept as raw
+           bytes, and they are decoded under the specified encoding only when
+           requested
+
+           If draft is True, the processor runs in draft mode, i.e., without
+           generating the output file
 
         """
 
@@ -264,55 +658,63 @@ class Processor:
         self._nbcycles += 1
 
         # show the command to run even if quiet is True
-        print(f' {self._processor} {self._texfile}')
+        print(f' {self._processor} {self._texfile}' + (' (draft)' if draft else ''))
 
         # When starting a new process, ensure that all warnings and errors are
         # removed
         self._warnings = defaultdict(ProcessorWarnings)
         self._global_warnings = message.Messages()
+        self._seen = set()
         self._errors: list[message.Message] = []
 
-        # first things first, run latex at least once over the given tex file
+        # first things first, run latex at least once over the given tex file.
+        # Descriptors are not inheritable by default, so that there is no need
+        # to close them explicitly, which would prevent using posix_spawn
         sproc = subprocess.Popen(
-            shlex.split(f'{self._processor} -interaction=nonstopmode -halt-on-error -file-line-error -recorder {self._texfile}'),
-            env={**os.environ},
+            self._draft_argv if draft else self._argv,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            close_fds=True,
+            close_fds=False,
         )
 
-        # get both the standard output and standard error decoded under the
-        # specified encoding schema
-        out_bytes, err_bytes = sproc.communicate()
-        self._stdout = out_bytes.decode(encoding=self._encoding, errors="replace")
-        self._stderr = err_bytes.decode(encoding=self._encoding, errors="replace")
+        # get both the standard output and standard error. They are not decoded
+        # since all the information is taken from the .log file
+        (self._stdout, self._stderr) = read_pipes(sproc)
+        sproc.wait()
         self._return_code = sproc.returncode
 
-        # update the rerun flag. The information should be found in the .log file
-        log_file = self._texfile.with_suffix(".log")
-        txt = log_file.read_text(encoding=self._encoding, errors="ignore")
-        self._rerun = RE_RERUN.search(txt) is not None
+        # the .log file is mapped into memory only once and scanned as raw
+        # bytes, so that only the matches are decoded
+        try:
+            with open(self._log_filename, 'rb') as stream, map_log_file(stream) as log_data:
+
+                # update the rerun flag. The information should be found in the
+                # .log file, usually near its end. Hence, the tail of the file
+                # is examined first and, only if nothing is found there, the
+                # whole file is scanned
+                self._rerun = RE_RERUN.search(log_data[-RERUN_TAIL_SIZE:]) is not None or \
+                    (len(log_data) > RERUN_TAIL_SIZE and RE_RERUN.search(log_data) is not None)
+
+                # process the output to find all errors, if any, and also the
+                # warnings unless another run is recommended. In draft mode,
+                # another run always follows, so that warnings are skipped
+                self._warnings_parsed = not self._rerun and not draft
+                self.process_log(log_data, self._warnings_parsed)
 
-        # process the output to find all warnings and errors, if any
-        self.process_warnings()
-        self.process_errors()
+        except FileNotFoundError:
+            print(WARNING_NO_FILE_FOUND.format(self._log_filename))
+            self._rerun = False
 
         # and show all warnings on the standard console indexed by the file where
         # they were detected unless quiet is True
-        if not self._quiet:
-            for ifile in self.get_input_files():
-                if len(self.get_warnings(ifile)) > 0:
-                    if ifile == "":
-                        print(" Preamble:")
-                    else:
-                        print(f" {ifile}")
-                    print(f"{self.get_warnings(ifile):proc_warning}")
+        if self._warnings_parsed and not self._quiet:
+            self.show_warnings()
 
         # and finally, in case there are any errors show them on the standard
         # output even in quiet mode
-        if len(self.get_errors()) > 0:
+        if len(errors := self.get_errors()) > 0:
             print(" Errors found!")
-            for ierror in self.get_errors():
+            for ierror in errors:
                 print(f'{ierror:proc_error}')
 
         # if no errors were found, observe the return code anyway. Only if no errors
@@ -328,80 +730,104 @@ class Processor:
 
 
     def process_warnings(self):
-        """Process the .log file generated by the processing of the main LaTeX
-           file and updates information about all warnings encountered
+        """Process the .log file generated by the last run of the processor to
+           find all warnings in case they were skipped because another run was
+           recommended, and show them unless quiet is True
 
         """
 
-        # open the log file
-        log_filename = self._texfile.with_suffix(".log")
-        if not log_filename.exists():
-            print(WARNING_NO_FILE_FOUND.format(log_filename))
+        # if the warnings of the last run were already parsed, do nothing
+        if self._warnings_parsed:
+            return
+
+        # otherwise, process the .log file again. Since errors are found as
+        # well, the current ones are removed
+        self._errors: list[message.Message] = []
+        try:
+            with open(self._log_filename, 'rb') as stream, map_log_file(stream) as log_data:
+                self.process_log(log_data)
+        except FileNotFoundError:
+            print(WARNING_NO_FILE_FOUND.format(self._log_filename))
             return
+        self._warnings_parsed = True
 
-        # and now get all contents using the specified encoding, and process
-        # them removing all embedded newlines because LaTeX warnings usually
-        # span over several lines. Also, check for input files being processed
-        # and store the warnings found under the current file being processed
-        log_text = log_filename.read_text(encoding=self._encoding, errors="replace")
-        log_no_wrap = re.sub(r'\n(?!\n)', ' ', log_text)
+        # and show them unless quiet is True
+        if not self._quiet:
+            self.show_warnings()
+
+    def show_warnings(self):
+        """Show all warnings on the standard console indexed by the file where
+           they were detected
+
+        """
 
-        # Process all forms of warnings and retrieve information from them
+        for ifile in self.get_input_files():
+            if (warnings := self.get_warnings(ifile)) is not None and len(warnings) > 0:
+                if ifile == "":
+                    print(" Preamble:")
+                else:
+                    print(f" {ifile}")
+                print(f"{warnings:proc_warning}")
+
+    def process_log(self, log_data, with_warnings: bool = True):
+        """Process the raw contents of the .log file generated by the processing
+           of the main LaTeX file and updates information about all warnings and
+           errors encountered. Though only one error should be generated, let us
+           be paranoid!
+
+           If with_warnings is False, only errors are looked for
+
+        """
+
+        # First, collect the groups of all matches as raw tuples in a single
+        # comprehension, so that no match object outlives it. Errors are
+        # searched for over the whole log, so that none is swallowed by the
+        # text of a preceding warning
+        errors = [m.groups() for m in RE_ERROR.finditer(log_data)]
+        records = [(kind, m.groups()) for (kind, m) in scan_log(log_data, LOG_SCANNERS)] if with_warnings else []
+
+        # only the text matched is decoded under the specified encoding
+        def decode(raw: bytes | None) -> str | None:
+            return None if raw is None else raw.decode(encoding=self._encoding, errors="replace")
+
+        # Create a new message with the data of every error
+        for groups in errors:
+            (path, line, body) = map(decode, groups)
+            self._errors.append(message.Message(path=path, line=line, info=body))
+
+        # Process all input files and warnings. Warnings are stored under the
+        # current file being processed
         file_key = ""
-        for m in RE_COMBINED_INPUT_WARN_GENERIC.finditer(log_no_wrap):
+        for (kind, groups) in records:
 
             # If this is a file being processed
-            if m.group("filename") is not None:
+            if kind == LOG_INPUT:
 
                 # and create a new entry for this file to store all warnings
                 # that might be found unless it already exists. It might happen
                 # that a processor inputs the same file several times (e.g.,
                 # *.aux) but warnings should be shown only once
-                file_key = m.group("filename") + m.group("suffix")
+                (filename, suffix) = map(decode, groups)
+                file_key = unwrap_lines(filename) + suffix
                 if file_key not in self._input_files:
                     self._input_files.append(file_key)
                 continue
 
-            # otherwise, create a new warning
-            new_warning = message.Message(
-                mode=m.group("mode").strip(),
-                name="" if m.group("name") is None else m.group("name").strip(),
-                info=re.sub(r' {2,}', ' ', m.group("msg").strip()),
-            )
-
-            # and add it to the collection of warnings of the file being
-            # currently processed, unless it has been found before
-            if new_warning not in self._global_warnings:
-                self._warnings[file_key] += new_warning
-                self._global_warnings += new_warning
-
-
-    def process_errors(self):
-        """Process the .log file generated by the processing of the main LaTeX
-           file and updates information about all errors encountered, though
-           only one should be generated but let us be paranoid!
-
-        """
-
-        # open the log file
-        log_filename = self._texfile.with_suffix(".log")
-        if not log_filename.exists():
-            print(WARNING_NO_FILE_FOUND.format(log_filename))
-            return
-
-        # and get all contents of this file
-        log_text = log_filename.read_text(encoding=self._encoding, errors="replace")
-
-        # Now, look for errors
-        for m in RE_ERROR.finditer(log_text):
+            # otherwise, compute the fingerprint of this warning and skip it if
+            # it has been found before
+            (mode, name, msg) = map(decode, groups)
+            fingerprint = (mode.strip(),
+                           "" if name is None else unwrap_lines(name).strip(),
+                           RE_MULTISPACE.sub(' ', unwrap_lines(msg).strip()))
+            if fingerprint in self._seen:
+                continue
+            self._seen.add(fingerprint)
 
-            # Then create a new message with the data of an error
-            new_error = message.Message(
-                path=m.group("path"),
-                line=m.group("line"),
-                info=m.group("body"),
-            )
-            self._errors.append(new_error)
+            # and only then create a new warning and add it to the collection
+            # of warnings of the file being currently processed
+            new_warning = message.Message(mode=fingerprint[0], name=fingerprint[1], info=fingerprint[2])
+            self._warnings[file_key] += new_warning
+            self._global_warnings += new_warning
 
 
 # Local Variables: